@@ -363,7 +363,9 @@ def t_IDENTIFIER(t):
         t.type = keywords[t.value]
     else:
         t.type = "IDENTIFIER"
-        t.value = ("identifier", t.value, find_column(t.lexpos))
+        # names repeat a lot, interning them makes the symbol table
+        # lookups and comparisons on them identity checks
+        t.value = ("identifier", sys.intern(t.value), find_column(t.lexpos))
 
     t.lexer.begin('InsertSemi')
     return t
@@ -54,6 +54,7 @@ precedence = (
 def p_SourceFile(p):
     """SourceFile : PackageClause ';' ImportDeclList TopLevelDeclList"""
     ast.data = p[1]
+    ast._str_cache = None
     utils.package_name = ast.data
     ast.add_child(p[3])
     ast.add_child(p[4])
@@ -358,7 +359,9 @@ def p_ForStmt(p):
     """
     if len(p) == 5:
         p[0] = syntree.ForStmt(
-            body=p[3], clause=syntree.Literal("bool", "true"), lineno=p.lineno(1)
+            body=p[3],
+            clause=syntree.BoolLiteral("true", lineno=p.lineno(1)),
+            lineno=p.lineno(1),
         )
     elif len(p) == 6:
         p[0] = syntree.ForStmt(body=p[4], clause=p[3], lineno=p.lineno(1))
@@ -375,7 +378,10 @@ def p_ForClause(p):
     """
     if len(p) == 5:
         p[0] = syntree.ForClause(
-            p[1], cond=syntree.Literal("bool", "true"), post=p[4], lineno=p.lineno(1)
+            p[1],
+            cond=syntree.BoolLiteral("true", lineno=p.lineno(1)),
+            post=p[4],
+            lineno=p.lineno(1),
         )
     elif len(p) == 6:
         p[0] = syntree.ForClause(p[1], cond=p[3], post=p[5], lineno=p.lineno(1))
@@ -594,7 +600,7 @@ def p_IdentifierList(p):
     if len(p) == 2:
         p[0] = syntree.List([syntree.Identifier(p[1], p.lineno(1))])
     elif len(p) == 4:
-        p[3].append(syntree.Identifier(p[1], p.lineno(1)))
+        p[3]._append(syntree.Identifier(p[1], p.lineno(1)))
         p[0] = p[3]
 
 
@@ -603,7 +609,7 @@ def p_ExpressionList(p):
     | Expression ',' ExpressionList
     """
     if len(p) == 4:
-        p[3].append(p[1])
+        p[3]._append(p[1])
         p[0] = p[3]
     elif len(p) == 2:
         p[0] = syntree.List([p[1]])
@@ -835,7 +841,7 @@ def p_BasicLit(p):
     | bool_lit
     """
     # TODO : Add other basic literals
-    p[0] = syntree.Literal(p[1][0], p[1][1], lineno=p.lineno(1))
+    p[0] = syntree.make_literal(p[1][0], p[1][1], lineno=p.lineno(1))
 
 
 def p_FunctionLit(p):
@@ -1,3 +1,4 @@
+from collections import deque
 from pptree.utils import *
 from pptree.pptree import print_tree_horizontally, print_tree_vertically
 
@@ -17,12 +18,19 @@ def print_tree(current_node, childattr='children', nameattr='name', horizontal=T
         size_branch = {child: nb_children(child) for child in children(current_node)}
 
         """ Creation of balanced lists for "a" branch and "b" branch. """
-        a = children(current_node)
-        b = []
-        while a and sum(size_branch[node] for node in b) < sum(size_branch[node] for node in a):
-            b.insert(0, a.pop())
-
-        return a, b
+        # work on a copy, popping from the node's own children
+        # would strip the tree while printing it
+        a = list(children(current_node))
+        b = deque()
+        size_a = sum(size_branch[node] for node in a)
+        size_b = 0
+        while a and size_b < size_a:
+            node = a.pop()
+            b.appendleft(node)
+            size_a -= size_branch[node]
+            size_b += size_branch[node]
+
+        return a, list(b)
 
     if horizontal:
         print_tree_horizontally(current_node, balanced_branches, name)
@@ -0,0 +1,19 @@
+"""Optional build step: compiles syntree.py and tac.py into C extensions
+with Cython.
+
+    python setup.py build_ext --inplace
+
+The pure Python modules are used as is when the extensions are not built.
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="gopy",
+    ext_modules=cythonize(
+        ["syntree.py", "tac.py"],
+        language_level=3,
+        # the annotations in these modules are informal hints, not C types
+        compiler_directives={"annotation_typing": False},
+    ),
+)
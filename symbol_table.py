@@ -72,7 +72,7 @@ class SymbolTable:
         self.stack: List[Dict[str, SymbolInfo]] = [{}]
         self.cur_scope = "1"
         self.depth = 1
-        self.scopes_at_depth: Dict[int, int] = defaultdict(lambda: 0)
+        self.scopes_at_depth: Dict[int, int] = defaultdict(int)
 
         self._add_cur_scope_symbols()
 
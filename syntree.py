@@ -1,7 +1,8 @@
+import sys
 import traceback
 
 from symbol_table import SymbolInfo
-from typing import Any, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 from go_lexer import symtab
 from utils import (
     print_error,
@@ -11,21 +12,53 @@ from utils import (
 )
 
 
+# children of every leaf node. Leaves never get children added,
+# so they can all share this one immutable value
+_EMPTY_CHILDREN: tuple = ()
+
+
 class Node:
     """Node of an AST
 
     Warning: pls don't change the children values after setting them
-    for nodes which depend on it"""
+    for nodes which depend on it
+
+    Leaf nodes (identifiers, basic literals, etc.) store their empty
+    children as _EMPTY_CHILDREN, a tuple, so it can't be modified"""
+
+    __slots__ = ("name", "children", "data", "_str_cache")
+
+    def __init__(self, name, children, data=None):
+        self.name = name
+        if children is _EMPTY_CHILDREN:
+            self.children = children
+        else:
+            self.children: list = [c for c in children if c is not None]
+        self.data = data
+        self._str_cache: Optional[str] = None
+
+    def _init_unfiltered(self, name, children, data=None):
+        """Same as __init__, but takes children as is.
 
-    def __init__(self, name, **kwargs):
+        For nodes which already know children has no None in it"""
         self.name = name
-        self.children: list = [c for c in kwargs["children"] if c is not None]
-        self.data = kwargs.get("data", None)
+        self.children = children
+        self.data = data
+        self._str_cache: Optional[str] = None
 
     def __repr__(self):
         return str(self)
 
     def __str__(self):
+        # the string is built once, so a node must not be printed
+        # before its data is final (code that sets data later has to
+        # reset _str_cache). Subclasses override _make_str instead
+        s = self._str_cache
+        if s is None:
+            s = self._str_cache = self._make_str()
+        return s
+
+    def _make_str(self) -> str:
         if self.data is not None:
             return f"<{self.name}: {str(self.data)}>"
         else:
@@ -38,18 +71,35 @@ class Node:
         if child is not None:
             self.children.append(child)
 
+    def _append(self, child):
+        """Same as add_child, for callers which know child is not None"""
+        self.children.append(child)
+
 
 class Identifier(Node):
     """Node for identifiers"""
 
+    __slots__ = ()
+
     def __init__(self, ident_tuple, lineno):
-        super().__init__("IDENTIFIER",
-                         children=[],
-                         data=(ident_tuple[1], lineno, ident_tuple[2]))
+        self._init_unfiltered("IDENTIFIER",
+                              children=_EMPTY_CHILDREN,
+                              data=(ident_tuple[1], lineno, ident_tuple[2]))
         # symtab.add_if_not_exists(ident_tuple[1])
-        self.ident_name = ident_tuple[1]
-        self.lineno = lineno
-        self.col_num = ident_tuple[2]
+
+    # the fields below are stored only once, in self.data
+
+    @property
+    def ident_name(self) -> str:
+        return self.data[0]
+
+    @property
+    def lineno(self) -> int:
+        return self.data[1]
+
+    @property
+    def col_num(self) -> int:
+        return self.data[2]
 
     def add_symtab(self):
         symtab.add_if_not_exists(self.ident_name)
@@ -61,6 +111,10 @@ class Identifier(Node):
 class BinOp(Node):
     """Node for binary operations"""
 
+    __slots__ = (
+        "operator", "left", "right", "lineno", "is_relop", "is_logical", "type_"
+    )
+
     rel_ops = {"==", "!=", "<", ">", "<=", ">="}
     logical_ops = {"&&", "||"}
 
@@ -140,6 +194,8 @@ class BinOp(Node):
 class Assignment(BinOp):
     """Node for assignment operations"""
 
+    __slots__ = ()
+
     def __init__(self, operator, left=None, right=None, lineno=None):
         if isinstance(left, List) and len(left.children) == 1 and isinstance(left.children[0], PrimaryExpr):
             left_ = left.children[0]
@@ -155,8 +211,11 @@ class Assignment(BinOp):
 class UnaryOp(Node):
     """Node for unary operations"""
 
+    __slots__ = ("operand", "operator", "type_", "lineno")
+
     def __init__(self, operator, operand, lineno: int):
-        if isinstance(operand, UnaryOp) and operand.operator is None:
+        # collapse operator-less wrappers, however deeply nested
+        while type(operand) is UnaryOp and operand.operator is None:
             operand = operand.operand
 
         super().__init__("Unary", children=[operand], data=operator)
@@ -183,31 +242,28 @@ class PrimaryExpr(Node):
     Ref: https://golang.org/ref/spec#PrimaryExpr
     """
 
+    __slots__ = ("operand", "col_no", "ident", "lineno")
+
     def __init__(self, operand, lineno: int, children=None):
         # small optimization for the case when PrimaryExpr
         # has children of [PrimaryExpr, something]
         # with PrimaryExpr having only data and no children
         if operand is None and children is not None:
             if len(children) == 2 and isinstance(children[0], PrimaryExpr):
-                if children[0].children is None or children[0].children == []:
+                if not children[0].children:
                     operand = children[0].data
                     children = children[1:]
 
-        super().__init__("PrimaryExpr",
-                         children=[] if children is None else children,
-                         data=operand)
+        # children is either None or [PrimaryExpr, Index] from the parser
+        if children is None:
+            children = _EMPTY_CHILDREN
+        self._init_unfiltered("PrimaryExpr", children=children, data=operand)
+        self.operand: tuple = operand
+        self.col_no = operand[-1] if operand is not None else None
         self.ident: Optional[SymbolInfo] = symtab.get_symbol(
             operand[1] if isinstance(operand, tuple) else "")
         self.lineno = lineno
 
-    @property
-    def operand(self) -> tuple:
-        return self.data
-
-    @property
-    def col_no(self):
-        return self.operand[-1]
-
     def data_str(self):
         # self.data can be an IDENTIFIER sometimes, so just show the name
         if isinstance(self.data, tuple) and self.data[0] == "identifier":
@@ -217,7 +273,13 @@ class PrimaryExpr(Node):
 
 
 class Literal(Node):
-    """Node to store literals"""
+    """Node to store literals
+
+    Basic literals are built as one of the subclasses below (see
+    make_literal), those keep type_ on the class and just the value
+    in data. Composite literals keep data as (type_, value)"""
+
+    __slots__ = ("lineno",)
 
     def __init__(self, type_, value, lineno: int):
         children = []
@@ -227,25 +289,95 @@ class Literal(Node):
         if isinstance(value, Node):
             children.append(value)
 
-        super().__init__("LITERAL", children=children, data=(type_, value))
+        if not children:
+            children = _EMPTY_CHILDREN
+
+        self._init_unfiltered("LITERAL", children=children, data=(type_, value))
 
-        self.type_ = type_
-        self.value = value
         self.lineno = lineno
 
+    # the fields below are stored only once, in self.data
+    @property
+    def type_(self):
+        return self.data[0]
+
+    @property
+    def value(self):
+        return self.data[1]
+
     def data_str(self):
         return f"type: {self.type_}, value: {self.value}"
 
-    def __str__(self):
+    def _make_str(self):
         return str(self.value)
 
 
+class _BasicLiteral(Literal):
+    """Base of the basic literals, type_ is a class attribute
+    and data is the value itself"""
+
+    __slots__ = ()
+
+    def __init__(self, value, lineno: Optional[int] = None):
+        self._init_unfiltered("LITERAL", children=_EMPTY_CHILDREN, data=value)
+        self.lineno = lineno
+
+    @property
+    def value(self):
+        return self.data
+
+
+class IntLiteral(_BasicLiteral):
+    __slots__ = ()
+    type_ = "int"
+
+
+class FloatLiteral(_BasicLiteral):
+    __slots__ = ()
+    type_ = "float64"
+
+
+class StringLiteral(_BasicLiteral):
+    __slots__ = ()
+    type_ = "string"
+
+    def __init__(self, value, lineno: Optional[int] = None):
+        super().__init__(sys.intern(value), lineno)
+
+
+class BoolLiteral(_BasicLiteral):
+    __slots__ = ()
+    type_ = "bool"
+
+    def __init__(self, value, lineno: Optional[int] = None):
+        super().__init__(sys.intern(value), lineno)
+
+
+_basic_literals: Dict[str, type] = {
+    cls.type_: cls
+    for cls in (IntLiteral, FloatLiteral, StringLiteral, BoolLiteral)
+}
+
+
+def make_literal(type_, value, lineno: Optional[int] = None) -> Literal:
+    """Creates the Literal subclass for type_, falls back
+    to a plain Literal for other types"""
+    cls = _basic_literals.get(type_)
+    if cls is None:
+        return Literal(type_, value, lineno)
+    return cls(value, lineno)
+
+
 class Import(Node):
     """Node to store imports"""
 
+    __slots__ = ()
+
     def __init__(self, pkg_name, import_path):
         # import_path is a STRING_LIT, so it has ("string", value)
-        super().__init__("import", children=[], data=(pkg_name, import_path))
+        self._init_unfiltered("import",
+                              children=_EMPTY_CHILDREN,
+                              data=(pkg_name, import_path))
 
     def data_str(self):
         return f"name: {self.data[0]}, path: {self.data[1][1]}"
@@ -254,22 +386,40 @@ class Import(Node):
 class List(Node):
     """Node to store literals"""
 
+    # the length is kept up to date by add_child, children of a List
+    # must not be added or removed in any other way
+    __slots__ = ("_len",)
+
     def __init__(self, children):
         super().__init__("LIST", children=children)
-        self.append = self.add_child
+        self._len = len(self.children)
+
+    def add_child(self, child):
+        if child is not None:
+            self.children.append(child)
+            self._len += 1
+
+    def _append(self, child):
+        self.children.append(child)
+        self._len += 1
+
+    append = add_child
 
     def __iter__(self):
         return iter(self.children)
 
     def __len__(self):
-        return len(self.children)
+        return self._len
 
 
 class Arguments(Node):
     """Node to store function arguments"""
 
+    __slots__ = ("expression_list",)
+
     def __init__(self, expression_list):
-        super().__init__("arguments", children=[expression_list])
+        children = [] if expression_list is None else [expression_list]
+        self._init_unfiltered("arguments", children=children)
         self.expression_list = expression_list
 
 
@@ -278,6 +428,8 @@ class FunctionCall(Node):
 
     Is a part of PrimaryExpr in the grammar, but separated here"""
 
+    __slots__ = ("fn_name", "arguments", "fn_sym", "type_")
+
     def __init__(self, fn_name: Any, arguments: Arguments):
         pos = fn_name.lineno, fn_name.col_no
 
@@ -378,6 +530,8 @@ def print_func_err(
 class Signature(Node):
     """Node to store function signature"""
 
+    __slots__ = ("parameters", "result", "ret_type")
+
     def __init__(self, parameters, result=None):
         self.parameters = parameters
         self.result = result
@@ -392,14 +546,16 @@ class Signature(Node):
 class Function(Node):
     """Node to store function declaration"""
 
+    # signature and body are kept as attributes even though they are
+    # children too, because the children get rewritten by _optimize
+    __slots__ = ("signature", "body")
+
     def __init__(self, name: Optional[tuple], signature, lineno: int, body=None):
         super().__init__("FUNCTION",
                          children=[signature, body],
                          data=(name, lineno))
         self.data: tuple
 
-        self.fn_name = name
-        self.lineno = lineno
         self.signature = signature
         self.body = body
 
@@ -411,7 +567,7 @@ class Function(Node):
                                const=True,
                                value=self)
 
-    def __str__(self) -> str:
+    def _make_str(self) -> str:
         func_typename: str = FunctionType.get_func_typename(self.signature)
         para_list: str = func_typename[4:]
         return f"func {self.fn_name[1]}{para_list} {{...}}"
@@ -426,6 +582,14 @@ class Function(Node):
                                     const=True,
                                     value=value)
 
+    @property
+    def fn_name(self) -> Optional[tuple]:
+        return self.data[0]
+
+    @property
+    def lineno(self) -> int:
+        return self.data[1]
+
     def data_str(self):
         return f"name: {self.fn_name}, lineno: {self.lineno}"
 
@@ -433,11 +597,14 @@ class Function(Node):
 class Keyword(Node):
     """Node to store a single keyword - like return, break, continue, etc."""
 
+    __slots__ = ("kw", "ext", "lineno")
+
     def __init__(self, kw, ext=None, children=None, lineno=None):
         self.kw = kw
         self.ext = ext if ext is not None else ()
         self.lineno = lineno
-        children = [] if children is None else children
+        if children is None:
+            children = _EMPTY_CHILDREN
 
         super().__init__(kw, children=children, data=(kw, *self.ext))
 
@@ -448,12 +615,14 @@ class Keyword(Node):
 class Type(Node):
     """Parent class for all types"""
 
+    __slots__ = ("typename", "storage")
+
     def __init__(
         self,
         type_class: str,
         typename: str,
         storage: Optional[int] = None,
-        **kwargs
+        children: Optional[list] = None
     ):
         # type_class could be ARRAY, SLICE, FUNCTION, BasicType, TypeDecl
         self.typename = typename
@@ -461,16 +630,18 @@ class Type(Node):
         super().__init__(
                 type_class,
                 data=typename,
-                children=kwargs.get("children", [])
+                children=_EMPTY_CHILDREN if children is None else children
             )
 
-    def __str__(self):
+    def _make_str(self):
         return f"<{self.typename}>"
 
 
 class FunctionType(Type):
     """Node for FunctionType"""
 
+    __slots__ = ("signature", "ret_typename")
+
     def __init__(self, signature: Signature):
         assert signature is not None
         self.signature = signature
@@ -514,6 +685,8 @@ class FunctionType(Type):
 class Array(Type):
     """Node for an array type"""
 
+    __slots__ = ("eltype", "length")
+
     def __init__(self, eltype, length):
         self.eltype = eltype
         self.length = length.value
@@ -532,6 +705,8 @@ class Array(Type):
 class Slice(Type):
     """Node for a slice type"""
 
+    __slots__ = ("eltype",)
+
     def __init__(self, eltype: Type):
         self.eltype = eltype
         typename = f"SLICE_{self.eltype.typename}"
@@ -625,6 +800,8 @@ def infer_expr_typename(expr: Union[
 class Index(Node):
     """Node for array/slice indexing"""
 
+    __slots__ = ("expr",)
+
     def __init__(self, expr):
         super().__init__("INDEX", children=[expr], data=None)
 
@@ -634,15 +811,14 @@ class Index(Node):
 class QualifiedIdent(Node):
     """Node for qualified identifiers"""
 
+    __slots__ = ("lineno", "col_no")
+
     def __init__(self, package_name, identifier, lineno: int):
-        super().__init__("IDENTIFIER",
-                         children=[],
-                         data=(package_name, identifier))
+        self._init_unfiltered("IDENTIFIER",
+                              children=_EMPTY_CHILDREN,
+                              data=(package_name, identifier))
         self.lineno = lineno
-
-    @property
-    def col_no(self) -> int:
-        self.data[-1][-1]
+        self.col_no: int = identifier[-1]
 
     def data_str(self):
         return f"package: {self.data[0][1]}, name: {self.data[1][1]}"
@@ -651,17 +827,15 @@ class QualifiedIdent(Node):
 class VarDecl(Node):
     """Node to store one variable or const declaration"""
 
+    __slots__ = ("symbol",)
+
     def __init__(self,
                  ident: Identifier,
                  type_=None,
                  value=None,
                  const: bool = False):
-        self.ident = ident
-        self.type_ = type_
-        self.value = value
-        self.const = const
         self.symbol: Optional[SymbolInfo] = symtab.get_symbol(
-            self.ident.ident_name)
+            ident.ident_name)
 
         children = []
 
@@ -679,6 +853,24 @@ class VarDecl(Node):
                          children=children,
                          data=(ident, type_, value, const))
 
+    # the fields below are stored only once, in self.data
+
+    @property
+    def ident(self) -> Identifier:
+        return self.data[0]
+
+    @property
+    def type_(self):
+        return self.data[1]
+
+    @property
+    def value(self):
+        return self.data[2]
+
+    @property
+    def const(self) -> bool:
+        return self.data[3]
+
     def data_str(self):
         s = f"name: {self.ident.ident_name}"
 
@@ -700,18 +892,17 @@ def make_variable_decls(
     const: bool = False,
 ):
     var_list = List([])
+    declare = symtab.declare_new_variable
 
     if expression_list is None:
         # TODO: implement default values
         ident: Identifier
-        for ident in identifier_list:
-            symtab.declare_new_variable(
-                ident.ident_name,
-                ident.lineno,
-                ident.col_num,
-                type_=type_,
-                const=const,
-            )
+        for ident in identifier_list.children:
+            declare(ident.ident_name,
+                    ident.lineno,
+                    ident.col_num,
+                    type_=type_,
+                    const=const)
             var_list.append(VarDecl(ident, type_, const=const))
     elif len(identifier_list) == len(expression_list):
         ident: Identifier
@@ -719,7 +910,8 @@ def make_variable_decls(
 
         orig_type = type_
 
-        for ident, expr in zip(identifier_list, expression_list):
+        for ident, expr in zip(identifier_list.children,
+                               expression_list.children):
             # type inference
             inf_type = infer_expr_type(expr)
             if inf_type is None:
@@ -745,14 +937,12 @@ def make_variable_decls(
                             f"assignment to type {typename}")
                         print_line_marker_nowhitespace(ident.lineno)
 
-            symtab.declare_new_variable(
-                ident.ident_name,
-                ident.lineno,
-                ident.col_num,
-                type_=type_,
-                value=expr,
-                const=const,
-            )
+            declare(ident.ident_name,
+                    ident.lineno,
+                    ident.col_num,
+                    type_=type_,
+                    value=expr,
+                    const=const)
 
             var_list.append(VarDecl(ident, type_, expr, const))
             type_ = orig_type
@@ -765,6 +955,8 @@ def make_variable_decls(
 
 class ParameterDecl(Node):
 
+    __slots__ = ("type_", "vararg", "ident_list", "var_decl")
+
     def __init__(self, type_, vararg=False, ident_list=None):
         super().__init__("PARAMETERS",
                          children=[type_, ident_list],
@@ -781,6 +973,11 @@ class ParameterDecl(Node):
 
 class IfStmt(Node):
 
+    __slots__ = ("statement", "expr", "body", "next_", "lineno")
+
+    # signal the AST optimizer to not optimize these children
+    _no_optim = True
+
     def __init__(self, body, expr, statement=None, next_=None, lineno=None):
         super().__init__("IF", children=[statement, expr, body, next_])
         self.statement = statement
@@ -790,9 +987,6 @@ class IfStmt(Node):
 
         self.lineno = lineno
 
-        # signal the AST optimizer to not optimize these children
-        self._no_optim = True
-
         expr_typename = infer_expr_typename(expr)
         if isinstance(self.expr, BinOp):
             if expr_typename != "bool":
@@ -809,17 +1003,20 @@ class IfStmt(Node):
 
 class ForStmt(Node):
 
+    __slots__ = ("body", "clause", "lineno", "clause_typename")
+
+    # signal the AST optimizer to not optimize these children
+    _no_optim = True
+
     def __init__(self, body, clause, lineno):
         super().__init__("FOR", children=[body, clause])
         self.body = body
         self.clause = clause
         self.lineno = lineno
 
-        # signal the AST optimizer to not optimize these children
-        self._no_optim = True
-
-        clause_typename = infer_expr_typename(clause)
-        if clause_typename == "bool":
+        # kept for the TAC generation, which checks it again
+        self.clause_typename: Optional[str] = infer_expr_typename(clause)
+        if self.clause_typename == "bool":
             pass
         elif isinstance(clause, ForClause):
             pass
@@ -831,6 +1028,11 @@ class ForStmt(Node):
 
 class ForClause(Node):
 
+    __slots__ = ("init", "cond", "post", "lineno")
+
+    # signal the AST optimizer to not optimize these children
+    _no_optim = True
+
     def __init__(self, init, cond, post, lineno):
         super().__init__("FOR_CLAUSE", children=[init, cond, post])
         self.init = init
@@ -838,9 +1040,6 @@ class ForClause(Node):
         self.post = post
         self.lineno = lineno
 
-        # signal the AST optimizer to not optimize these children
-        self._no_optim = True
-
         cond_typename = infer_expr_typename(cond)
         if cond_typename != "bool":
             print_error("Invalid condition", kind="TYPE ERROR")
@@ -850,6 +1049,8 @@ class ForClause(Node):
 
 class RangeClause(Node):
 
+    __slots__ = ("var_decl", "expr", "ident_list", "expr_list")
+
     def __init__(self, expr, ident_list=None, expr_list=None):
         if ident_list is not None:
             self.var_decl = make_variable_decls(ident_list, expr)
@@ -864,6 +1065,8 @@ class RangeClause(Node):
 
 class Struct(Type):
 
+    __slots__ = ("fields",)
+
     def __init__(self, field_decl_list):
         self.fields = []
 
@@ -883,21 +1086,33 @@ class Struct(Type):
 
 class StructField(Node):
 
-    def __init__(self, name, type_, tag):
-        self.f_name = name
-        self.type_ = type_
-        self.tag = tag
+    __slots__ = ()
 
+    def __init__(self, name, type_, tag):
         super().__init__("StructField",
-                         children=[type_],
+                         children=_EMPTY_CHILDREN if type_ is None else [type_],
                          data=(name, type_, tag))
 
+    @property
+    def f_name(self):
+        return self.data[0]
+
+    @property
+    def type_(self):
+        return self.data[1]
+
+    @property
+    def tag(self):
+        return self.data[2]
+
     def data_str(self):
         return f"name: {self.f_name}, type: {self.type_}, tag: {self.tag}"
 
 
 class StructFieldDecl:
 
+    __slots__ = ("ident_list", "embed_field", "type_", "tag")
+
     def __init__(self, ident_list_or_embed_field, type_=None, tag=None):
         if isinstance(ident_list_or_embed_field, List):
             self.ident_list = ident_list_or_embed_field
@@ -911,6 +1126,9 @@ class StructFieldDecl:
 
 
 class TypeDef(Node):
+
+    __slots__ = ("typename", "type_")
+
     def __init__(self, typename: tuple, type_: Type, lineno: int):
         self.typename = typename
         self.type_ = type_
@@ -929,6 +1147,60 @@ class TypeDef(Node):
             )
 
 
+class NodeVisitor:
+    """Base class for passes that walk the AST
+
+    Subclasses define visit_<class name> methods, like visit_BinOp.
+    They are collected once per subclass into a table keyed by the
+    node class, so visit() is a single dict lookup on type(node).
+    A class without a method of its own uses the one of its closest
+    base class (visit_Literal is called for an IntLiteral), this is
+    looked up on first use and kept in the table. Nodes without a
+    method go to generic_visit."""
+
+    _dispatch: Dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        cls._dispatch = {}
+        for attr in dir(cls):
+            if not attr.startswith("visit_"):
+                continue
+            node_class = globals().get(attr[len("visit_"):])
+            if isinstance(node_class, type) and issubclass(node_class, Node):
+                cls._dispatch[node_class] = getattr(cls, attr)
+
+    @classmethod
+    def _resolve(cls, node_class: type) -> Optional[Callable]:
+        """Finds the method for node_class through its base classes
+        and adds it (or None, if there is no method) to the table"""
+        method = None
+        for base in node_class.__mro__[1:]:
+            method = cls._dispatch.get(base)
+            if method is not None:
+                break
+
+        cls._dispatch[node_class] = method
+        return method
+
+    def visit(self, node: Node):
+        node_class = type(node)
+        try:
+            method = self._dispatch[node_class]
+        except KeyError:
+            method = self._resolve(node_class)
+
+        if method is None:
+            return self.generic_visit(node)
+        return method(self, node)
+
+    def generic_visit(self, node: Node):
+        visit = self.visit
+        for child in node.children:
+            visit(child)
+
+
 def _optimize(node: Node) -> Node:
     num_list_childs = 0
 
@@ -1,22 +1,35 @@
 import abc
+import operator
 import syntree
 
 from collections import defaultdict
+from functools import singledispatch
 from symbol_table import SymbolInfo
 from typing import Any, Dict, List, Optional, Tuple
 from tabulate import tabulate
 from go_lexer import symtab  # type_table
 from utils import print_error, print_line_marker_nowhitespace
-from syntree import infer_expr_typename
+
+
+# row of a quad in the IC table, see IntermediateCode.__str__
+_ROW = operator.attrgetter("dest", "op1", "operator", "op2")
+
+# symtab is one object for the whole run, so the bound method
+# can be looked up once here, see TempVar
+_add_symbol = symtab.add_if_not_exists
 
 
 class Quad:
-    def __init__(self, dest, op1, op2, operator):
+    __slots__ = ("dest", "op1", "op2", "operator", "scope_id")
+
+    def __init__(self, dest, op1, op2, operator, scope_id=None):
         self.dest = dest
         self.op1 = op1
         self.op2 = op2
         self.operator = operator
-        self.scope_id = symtab.cur_scope
+        # the scope has to be taken when the quad is made,
+        # symtab.cur_scope changes as codegen goes on
+        self.scope_id = symtab.cur_scope if scope_id is None else scope_id
 
     def __str__(self):
         return f"{self.dest} = {self.op1} {self.operator} {self.op2}"
@@ -28,15 +41,18 @@ class Quad:
 class Assign(Quad):
     """An assignment operation (to a single value)"""
 
-    def __init__(self, dest, value, scope_id="1"):
-        self.scope_id = scope_id
-        super().__init__(dest, None, value, "=")
+    __slots__ = ()
+
+    def __init__(self, dest, value, scope_id=None):
+        super().__init__(dest, None, value, "=", scope_id)
 
     def __str__(self):
         return f"{self.dest} = {self.op2}"
 
 
 class Label(Quad):
+    __slots__ = ("name", "index")
+
     def __init__(self, name: str, index: int):
         self.name = name
         self.index = index
@@ -48,6 +64,8 @@ class Label(Quad):
 
 
 class GoTo(Quad):
+    __slots__ = ("label_name",)
+
     def __init__(self, label_name: str):
         self.label_name = label_name
 
@@ -58,6 +76,8 @@ class GoTo(Quad):
 
 
 class Call(Quad):
+    __slots__ = ("label_name", "res")
+
     def __init__(self, label_name: str, res: Any):
         self.label_name = label_name
         self.res = res
@@ -71,6 +91,8 @@ class Call(Quad):
 class ConditionalGoTo(Quad):
     """if operation goto label_name1 else goto label_name2"""
 
+    __slots__ = ("label_name1", "label_name2", "operation")
+
     def __init__(
         self, label_name1: str, operation: "TempVar", label_name2: Optional[str] = None
     ):
@@ -93,6 +115,8 @@ class ConditionalGoTo(Quad):
 class Single(Quad):
     """Quad to store a single value like a keyword"""
 
+    __slots__ = ()
+
     def __init__(self, value: Any):
         super().__init__(None, None, None, value)
 
@@ -103,6 +127,8 @@ class Single(Quad):
 class Double(Quad):
     """Quad to store two values"""
 
+    __slots__ = ()
+
     def __init__(self, op, value, dest=None):
         super().__init__(dest, None, value, op)
 
@@ -113,7 +139,21 @@ class Double(Quad):
             return f"{self.dest} = {self.operator} {self.op2}"
 
 
+class Push(Quad):
+    """Quad to push a function call argument, same as Double("push", value)"""
+
+    __slots__ = ()
+
+    def __init__(self, value: Any):
+        super().__init__(None, None, value, "push")
+
+    def __str__(self):
+        return f"push {self.op2}"
+
+
 class Operand(metaclass=abc.ABCMeta):
+    __slots__ = ()
+
     @property
     @abc.abstractmethod
     def name(self):
@@ -137,10 +177,27 @@ class Operand(metaclass=abc.ABCMeta):
         return self.name
 
 
+# temporary names by id, see _temp_name
+_temp_names: List[str] = []
+
+
+def _temp_name(id: int) -> str:
+    """Returns the name of temporary id ("t" + id), the names are made once
+    and shared by every TempVar (and renumbering) with the same id"""
+    while len(_temp_names) <= id:
+        _temp_names.append("t" + str(len(_temp_names)))
+    return _temp_names[id]
+
+
 class TempVar(Operand):
+    __slots__ = ("__name", "symbol")
+
     def __init__(self, id: int, value: Any = None, type_: Any = None):
-        self.__name = "t" + str(id)
-        self.symbol = symtab.add_if_not_exists(self.name)
+        self.__name = _temp_name(id)
+        # a Go program can declare a variable named like a temporary,
+        # so the name can exist in the current scope already (and that
+        # symbol is reused)
+        self.symbol = _add_symbol(self.name)
         self.symbol.const_flag = True if value is not None else False
         self.symbol.value = value
         self.symbol.type_ = type_
@@ -151,7 +208,7 @@ class TempVar(Operand):
 
     @name.setter
     def name(self, id: int):
-        self.__name = "t" + str(id)
+        self.__name = _temp_name(id)
 
     def is_const(self):
         return self.symbol.const_flag
@@ -182,20 +239,19 @@ class TempVar(Operand):
         return f"<Temp {self.name}>"
 
     def __hash__(self):
-        return hash(self.symbol.name + self.symbol.scope_id)
+        return hash((self.symbol.name, self.symbol.scope_id))
 
     def __eq__(self, other):
-        if isinstance(other, ActualVar):
-            if (
-                self.symbol.name == other.symbol.name
-                and self.symbol.scope_id == self.symbol.scope_id
-            ):
-                return True
-            return False
-        return False
+        return (
+            type(other) is type(self)
+            and self.symbol.name == other.symbol.name
+            and self.symbol.scope_id == other.symbol.scope_id
+        )
 
 
 class ActualVar(Operand):
+    __slots__ = ("__symbol",)
+
     def __init__(self, symbol: Optional[SymbolInfo]):
         self.__symbol = symbol
         self.symbol.const_flag = self.symbol.const
@@ -241,17 +297,14 @@ class ActualVar(Operand):
         self.symbol.type_ = value
 
     def __hash__(self):
-        return hash(self.symbol.name + self.symbol.scope_id)
+        return hash((self.symbol.name, self.symbol.scope_id))
 
     def __eq__(self, other):
-        if isinstance(other, ActualVar):
-            if (
-                self.symbol.name == other.symbol.name
-                and self.symbol.scope_id == self.symbol.scope_id
-            ):
-                return True
-            return False
-        return False
+        return (
+            type(other) is type(self)
+            and self.symbol.name == other.symbol.name
+            and self.symbol.scope_id == other.symbol.scope_id
+        )
 
     def __repr__(self):
         return f"<ActualVar {self.name}>"
@@ -261,9 +314,15 @@ class IntermediateCode:
     def __init__(self):
         self.code_list: List[Quad] = []
         self.temp_var_count = 0
-        self.label_prefix_counts: Dict[str, int] = defaultdict(lambda: 0)
+        self.label_prefix_counts: Dict[str, int] = defaultdict(int)
         self.label_map: Dict[str, Label] = {}
         self.loop_stack: List[Tuple[str, str]] = []
+        # len(self.loop_stack), for is_inloop
+        self._loop_depth = 0
+        # names of the functions being generated, innermost last
+        self.fn_stack: List[str] = []
+        # ActualVar of each symbol by id(symbol), see actual_var
+        self._actual_vars: Dict[int, ActualVar] = {}
 
         # BUILT-IN functions (or labels)
         self._add_label(self.get_fn_label("fmt__Println"))
@@ -274,6 +333,17 @@ class IntermediateCode:
         self.temp_var_count += 1
         return TempVar(self.temp_var_count, value)
 
+    def actual_var(self, symbol: SymbolInfo) -> ActualVar:
+        """Returns the ActualVar of symbol, made once per symbol.
+
+        All of its state is in the symbol, so it can be shared"""
+        actual_var = self._actual_vars.get(id(symbol))
+        if actual_var is None:
+            actual_var = ActualVar(symbol)
+            self._actual_vars[id(symbol)] = actual_var
+
+        return actual_var
+
     def add_to_list(self, code: Quad):
         self.code_list.append(code)
 
@@ -296,11 +366,11 @@ class IntermediateCode:
 
     def add_label(self, label_name: str) -> Label:
         """Add given label name. For named labels like functions, etc."""
-        if label_name in self.label_map:
+        # one probe of label_map, to check for and add the label
+        label = Label(label_name, len(self.code_list))
+        if self.label_map.setdefault(label_name, label) is not label:
             raise Exception(f"Label {label_name} already exists")
 
-        label = self._add_label(label_name, len(self.code_list))
-
         self.code_list.append(label)
 
         return label
@@ -337,54 +407,78 @@ class IntermediateCode:
 
     def enter_new_loop(self, start_label: str, end_label: str):
         self.loop_stack.append((start_label, end_label))
+        self._loop_depth += 1
 
     def exit_loop(self):
         self.loop_stack.pop()
+        self._loop_depth -= 1
 
     def is_inloop(self):
-        return len(self.loop_stack) > 0
+        return self._loop_depth > 0
 
     def get_nearest_loop(self):
         return self.loop_stack[-1]
 
     def print_three_address_code(self):
-        for i in self.code_list:
-            print(i)
+        if self.code_list:
+            print("\n".join(map(str, self.code_list)))
 
     def __str__(self) -> str:
         return str(
             tabulate(
-                [
-                    [i.dest, i.op1, i.operator, i.op2]
-                    for i in self.code_list
-                ],
+                map(_ROW, self.code_list),
                 headers=["Dest", "Operand 1", "Operator", "Operand 2"],
                 tablefmt="psql",
             )
         )
 
 
-def tac_Assignment(
+@singledispatch
+def tac_pre_dispatch(
+    node: syntree.Node, ic: IntermediateCode
+) -> Optional[List[syntree.Node]]:
+    """TAC function called before processing the children of node,
+    the tac_pre_ functions are registered to it by node class
+
+    A tac_pre_ function which generates code for some children itself
+    returns the children still to be processed, None means all of them"""
+
+
+@singledispatch
+def tac_dispatch(
+    node: syntree.Node,
     ic: IntermediateCode,
+    new_children: List[List[Any]],
+    return_val: List[Any],
+):
+    """TAC function called after processing the children of node,
+    the tac_ functions are registered to it by node class"""
+    return_val.append(node)
+
+
+@tac_dispatch.register(syntree.Assignment)
+def tac_Assignment(
     node: syntree.Assignment,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
     left = new_children[0][0]
     right = new_children[1][0]
     if len(node.operator) == 2 and node.operator[1] == "=":
-        ic.add_to_list(Quad(left, left, right, node.operator[0]))
+        ic.code_list.append(Quad(left, left, right, node.operator[0]))
         return_val.append(left)
     elif node.operator == "=":
-        ic.add_to_list(Assign(left, right))
+        ic.code_list.append(Assign(left, right))
         return_val.append(left)
 
     return_val.append(node)
 
 
+@tac_dispatch.register(syntree.BinOp)
 def tac_BinOp(
-    ic: IntermediateCode,
     node: syntree.BinOp,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
@@ -394,14 +488,17 @@ def tac_BinOp(
     # the children can be temporaries made in the _recur_codegen call above
     # so they are stored in new_children which is used here
     # each return value is a list, so the second [0] is needed
-    ic.add_to_list(Quad(temp, new_children[0][0], new_children[1][0], node.operator))
+    ic.code_list.append(
+        Quad(temp, new_children[0][0], new_children[1][0], node.operator)
+    )
 
     return_val.append(temp)
 
 
+@tac_dispatch.register(syntree.UnaryOp)
 def tac_UnaryOp(
-    ic: IntermediateCode,
     node: syntree.UnaryOp,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
@@ -422,9 +519,10 @@ def tac_UnaryOp(
         return_val.append(temp)
 
 
+@tac_dispatch.register(syntree.Literal)
 def tac_Literal(
-    ic: IntermediateCode,
     node: syntree.Literal,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
@@ -447,9 +545,10 @@ def tac_Literal(
             return_val.append(new_children[0][0])
 
 
+@tac_dispatch.register(syntree.Keyword)
 def tac_Keyword(
-    ic: IntermediateCode,
     node: syntree.Keyword,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
@@ -469,9 +568,10 @@ def tac_Keyword(
     return_val.append(node)
 
 
+@tac_dispatch.register(syntree.PrimaryExpr)
 def tac_PrimaryExpr(
-    ic: IntermediateCode,
     node: syntree.PrimaryExpr,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
@@ -481,7 +581,7 @@ def tac_PrimaryExpr(
             if node.ident is None:
                 print(f"Skipping undeclared identifier {node.data[1]}")
             else:
-                return_val.append(ActualVar(node.ident))
+                return_val.append(ic.actual_var(node.ident))
 
         # not so simple identifier
         elif len(node.children) == 1 and isinstance(node.children[0], syntree.Index):
@@ -491,7 +591,7 @@ def tac_PrimaryExpr(
 
             base_addr_t = ic.get_new_temp_var()
             base_addr_t.type_ = "int"
-            ic.add_to_list(Assign(base_addr_t, f"base({arr_name})"))
+            base_addr = Assign(base_addr_t, f"base({arr_name})")
             # return_val.append(base_addr_t)
 
             if ident is not None:
@@ -499,24 +599,27 @@ def tac_PrimaryExpr(
                 # width = syntree.Literal(
                 #     "int", type_table.get_type(ident.type_.eltype).storage
                 # )
-                width = syntree.Literal(
-                    "int", ident.type_.storage, None
-                )
+                width = syntree.IntLiteral(ident.type_.storage)
 
                 offset_t = ic.get_new_temp_var()
                 offset_t.type_ = "int"
-                ic.add_to_list(Quad(offset_t, ind, width, "*"))
 
                 index_t = ic.get_new_temp_var()
                 index_t.type_ = "int"
-                ic.add_to_list(Quad(index_t, base_addr_t, offset_t, "+"))
 
                 res_t = ic.get_new_temp_var()
                 res_t.type_ = ident.type_.eltype
-                ic.add_to_list(Quad(res_t, arr_name, index_t, "[]"))
+
+                ic.code_list.extend((
+                    base_addr,
+                    Quad(offset_t, ind, width, "*"),
+                    Quad(index_t, base_addr_t, offset_t, "+"),
+                    Quad(res_t, arr_name, index_t, "[]"),
+                ))
 
                 return_val.append(res_t)
             else:
+                ic.code_list.append(base_addr)
                 print("uhhh could not get type")
 
                 return_val.append(node)
@@ -539,7 +642,7 @@ def tac_PrimaryExpr(
         # temp1 = ic.get_new_temp_var()
         base_addr_t = ic.get_new_temp_var()
         base_addr_t.type_ = "int"
-        ic.add_to_list(Assign(base_addr_t, f"base({arr_name})"))
+        ic.code_list.append(Assign(base_addr_t, f"base({arr_name})"))
         return_val.append(base_addr_t)
 
         if ident is not None:
@@ -553,84 +656,85 @@ def tac_PrimaryExpr(
         return_val.append(node)
 
 
+@tac_dispatch.register(syntree.Index)
 def tac_Index(
-    ic: IntermediateCode,
     node: syntree.Index,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
     return_val.append(new_children[0])
 
 
-def tac_pre_VarDecl(ic: IntermediateCode, node: syntree.VarDecl):
+@tac_pre_dispatch.register(syntree.VarDecl)
+def tac_pre_VarDecl(node: syntree.VarDecl, ic: IntermediateCode):
     if len(node.children) > 1 and isinstance(node.children[1], syntree.BinOp):
         op = node.children[1]
 
+        # each side has to be a literal or a PrimaryExpr
+        # (the left side is generated before checking the right one)
         if isinstance(op.left, syntree.Literal):
-            if isinstance(op.right, syntree.Literal):
-                ic.add_to_list(
-                    Quad(ActualVar(node.symbol), op.left, op.right, op.operator)
-                )
-                node.children.remove(op)
-            elif isinstance(op.children[1], syntree.PrimaryExpr):
-                right = _recur_codegen(op.children[1], ic)[0]
-                ic.add_to_list(
-                    Quad(ActualVar(node.symbol), op.left, right, op.operator)
-                )
-                node.children.remove(op)
-
+            left = op.left
         elif isinstance(op.children[0], syntree.PrimaryExpr):
             left = _recur_codegen(op.children[0], ic)[0]
+        else:
+            return
+
+        if isinstance(op.right, syntree.Literal):
+            right = op.right
+        elif isinstance(op.children[1], syntree.PrimaryExpr):
+            right = _recur_codegen(op.children[1], ic)[0]
+        else:
+            return
 
-            if isinstance(op.right, syntree.Literal):
-                ic.add_to_list(
-                    Quad(ActualVar(node.symbol), left, op.right, op.operator)
-                )
-                node.children.remove(op)
+        ic.add_to_list(Quad(ic.actual_var(node.symbol), left, right, op.operator))
 
-            elif isinstance(op.children[1], syntree.PrimaryExpr):
-                right = _recur_codegen(op.children[1], ic)[0]
-                ic.add_to_list(Quad(ActualVar(node.symbol), left, right, op.operator))
-                node.children.remove(op)
+        # op is done, only the rest of the children are left
+        return [child for child in node.children if child is not op]
 
 
+@tac_dispatch.register(syntree.VarDecl)
 def tac_VarDecl(
-    ic: IntermediateCode,
     node: syntree.VarDecl,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
     if len(new_children) > 1:
         if len(new_children[1]) > 0:
-            ic.add_to_list(Assign(ActualVar(node.symbol), new_children[1][0]))
+            ic.add_to_list(Assign(ic.actual_var(node.symbol), new_children[1][0]))
         return_val.append(node.ident.ident_name)
 
 
+@tac_dispatch.register(syntree.List)
 def tac_List(
-    ic: IntermediateCode,
     node: syntree.List,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
     return_val.extend(new_children)
 
 
-def tac_pre_Function(ic: IntermediateCode, node: syntree.Function):
+@tac_pre_dispatch.register(syntree.Function)
+def tac_pre_Function(node: syntree.Function, ic: IntermediateCode):
     symtab.enter_scope()
     symtab.enter_scope()
 
     fn_name = syntree.FunctionCall.get_fn_name(node.fn_name)
+    ic.fn_stack.append(fn_name)
     fn_label = ic.get_fn_label(fn_name)
     ic.add_label(fn_label)
 
 
+@tac_dispatch.register(syntree.Function)
 def tac_Function(
-    ic: IntermediateCode,
     node: syntree.Function,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
-    fn_name = syntree.FunctionCall.get_fn_name(node.fn_name)
+    fn_name = ic.fn_stack.pop()
     fn_label = ic.get_fn_end_label(fn_name)
     ic.add_label(fn_label)
 
@@ -638,30 +742,33 @@ def tac_Function(
     symtab.leave_scope()
 
 
+def _flatten(values: List[Any]):
+    """Yields the non-list items of values, however deeply nested"""
+    for value in values:
+        if isinstance(value, list):
+            yield from _flatten(value)
+        else:
+            yield value
+
+
+@tac_dispatch.register(syntree.Arguments)
 def tac_Arguments(
-    ic: IntermediateCode,
     node: syntree.Arguments,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
-    for child in new_children:
-        if isinstance(child, list):
-            for subchild in child:
-                if isinstance(subchild, list):
-                    for subsubchild in subchild:
-                        ic.add_to_list(Double("push", subsubchild))
-                        return_val.append(subsubchild)
-                else:
-                    ic.add_to_list(Double("push", subchild))
-                    return_val.append(subchild)
-        else:
-            ic.add_to_list(Double("push", child[0]))
-            return_val.append(child[0])
+    # the return values of the arguments can be nested lists
+    # (an ExpressionList gives a list of return values)
+    args = list(_flatten(new_children))
+    ic.code_list.extend([Push(arg) for arg in args])
+    return_val.extend(args)
 
 
+@tac_dispatch.register(syntree.FunctionCall)
 def tac_FunctionCall(
-    ic: IntermediateCode,
     node: syntree.FunctionCall,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
@@ -672,25 +779,22 @@ def tac_FunctionCall(
     return_val.append(temp)
 
 
+@tac_pre_dispatch.register(syntree.IfStmt)
 def tac_pre_IfStmt(
-    ic: IntermediateCode,
     node: syntree.IfStmt,
+    ic: IntermediateCode,
 ):
     symtab.enter_scope()
 
     # there can be a statement to be executed just before
     # the condition. specified as "if a := 10; a > 5 {...}"
-    # we process the statement before anything else and remove
-    # it from the children
+    # we process the statement before anything else
     before_statement = node.statement
     if before_statement is not None:
         _recur_codegen(before_statement, ic)
-        node.children.remove(before_statement)
 
     # we'll process the condition here
-    # so we are removing it from the children
     condition = node.expr
-    node.children.remove(condition)
 
     condition_res = _recur_codegen(condition, ic)[0]
 
@@ -705,7 +809,6 @@ def tac_pre_IfStmt(
 
     # now the body (after true label)
     body = node.body
-    node.children.remove(body)
     _recur_codegen(body, ic)
     # false label after body
     ic.add_label(false_label)
@@ -717,35 +820,37 @@ def tac_pre_IfStmt(
     if next_ is not None:
         symtab.enter_scope()
 
-        node.children.remove(next_)
         _recur_codegen(next_, ic)
 
         symtab.leave_scope()
 
     symtab.leave_scope()
 
+    # all the children are processed here
+    return []
 
+
+@tac_dispatch.register(syntree.IfStmt)
 def tac_IfStmt(
-    ic: IntermediateCode,
     node: syntree.IfStmt,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
     pass
 
 
-def tac_pre_ForStmt(ic: IntermediateCode, node: syntree.ForStmt):
+@tac_pre_dispatch.register(syntree.ForStmt)
+def tac_pre_ForStmt(node: syntree.ForStmt, ic: IntermediateCode):
     symtab.enter_scope()
 
-    clause_typename = infer_expr_typename(node.clause)
-    if clause_typename == "bool":
+    if node.clause_typename == "bool":
         # start of loop
         start_label = ic.get_new_increment_label("for_simple_start")
         ic.add_label(start_label)
 
         # the condition
         condition = node.clause
-        node.children.remove(condition)
 
         condition_res = _recur_codegen(condition, ic)[0]
 
@@ -764,7 +869,6 @@ def tac_pre_ForStmt(ic: IntermediateCode, node: syntree.ForStmt):
         # now the body (after true label)
         body = node.body
         if body is not None:
-            node.children.remove(body)
             _recur_codegen(body, ic)
         # loop back to start label
         ic.add_goto(start_label)
@@ -779,7 +883,6 @@ def tac_pre_ForStmt(ic: IntermediateCode, node: syntree.ForStmt):
         # init statement (first part of for)
         if clause.init is not None:
             _recur_codegen(clause.init, ic)
-            clause.children.remove(clause.init)
 
         # start of loop (just before condition)
         start_label = ic.get_new_increment_label("for_cmpd_start")
@@ -787,7 +890,6 @@ def tac_pre_ForStmt(ic: IntermediateCode, node: syntree.ForStmt):
 
         # the condition
         condition = clause.cond
-        clause.children.remove(condition)
         condition_res = _recur_codegen(condition, ic)[0]
 
         true_label = ic.get_new_increment_label("for_cmpd_true")
@@ -805,12 +907,10 @@ def tac_pre_ForStmt(ic: IntermediateCode, node: syntree.ForStmt):
         # now the body (after true label)
         body = node.body
         if body is not None:
-            node.children.remove(body)
             _recur_codegen(body, ic)
         # the post statement (increment/decrement)
         if clause.post is not None:
             _recur_codegen(clause.post, ic)
-            clause.children.remove(clause.post)
         # loop back to start label
         ic.add_goto(start_label)
         # end label after body
@@ -820,56 +920,67 @@ def tac_pre_ForStmt(ic: IntermediateCode, node: syntree.ForStmt):
 
     else:
         print("Could not determine clause type")
+        # nothing is processed here, leave the children as they are
+        symtab.leave_scope()
+        return None
 
     symtab.leave_scope()
 
+    # all the children (body and clause) are processed here
+    return []
+
 
+@tac_dispatch.register(syntree.ForStmt)
 def tac_ForStmt(
-    ic: IntermediateCode,
     node: syntree.ForStmt,
+    ic: IntermediateCode,
     new_children: List[List[Any]],
     return_val: List[Any],
 ):
     symtab.leave_scope()
 
 
-ignored_nodes = {"Identifier", "Type", "Array"}
-
-
 def _recur_codegen(node: syntree.Node, ic: IntermediateCode):
     # process all child nodes before parent
     # ast is from right to left, so need to traverse in reverse order
-
-    node_class_name = node.__class__.__name__
-
-    # call TAC functions before processing children
-    # these have the prefix tac_pre_
-    tac_pre_fn_name = f"tac_pre_{node_class_name}"
-    if tac_pre_fn_name in globals():
-        globals()[tac_pre_fn_name](ic, node)
-
-    # recurse over children
-    new_children = []
-    for child in reversed(node.children):
-        new_children.append(_recur_codegen(child, ic))
-    new_children.reverse()
-
-    return_val = []
-
-    # call appropriate TAC functions after processing children
-    # at this point, the children are already in the IC
-    tac_fn_name = f"tac_{node_class_name}"
-    if tac_fn_name in globals():
-        globals()[tac_fn_name](ic, node, new_children, return_val)
-
-    elif node_class_name in ignored_nodes:
-        return_val.append(node)
-
-    else:
-
-        return_val.append(node)
-
-    return return_val
+    #
+    # walks the tree with an explicit stack instead of recursion,
+    # each entry is (node, new_children, results, index). new_children
+    # is None when the node is not visited yet, and the return value
+    # of node goes to results[index]
+    results: List[Any] = [None]
+    stack = [(node, None, results, 0)]
+
+    while stack:
+        node, new_children, out, index = stack.pop()
+
+        if new_children is None:
+            # call TAC functions before processing children
+            # these have the prefix tac_pre_
+            # they return the children left to process, if they
+            # processed some themselves
+            children = tac_pre_dispatch(node, ic)
+            if children is None:
+                children = node.children
+
+            # children are pushed in order, so they are popped (and
+            # processed) in reverse order. Their return values are
+            # written at their own index, so new_children is in order
+            new_children = [None] * len(children)
+            stack.append((node, new_children, out, index))
+            for i, child in enumerate(children):
+                stack.append((child, None, new_children, i))
+            continue
+
+        return_val = []
+
+        # call appropriate TAC functions after processing children
+        # at this point, the children are already in the IC
+        tac_dispatch(node, ic, new_children, return_val)
+
+        out[index] = return_val
+
+    return results[0]
 
 
 def intermediate_codegen(ast: syntree.Node) -> IntermediateCode:
@@ -0,0 +1,15 @@
+package main
+
+func main() {
+	var x int = 3
+
+	if x > 1 {
+		var a, b int = 1, 2
+		x = a + b
+	}
+
+	for x < 10 {
+		var c, d int = 1, 2
+		x = x + c + d
+	}
+}
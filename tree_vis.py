@@ -124,7 +124,7 @@ def draw_AST(ast: Node):
         splines="ortho",
         overlap=False,
     )
-    cache = defaultdict(lambda: 0)
+    cache = defaultdict(int)
 
     node_name = get_node_name(ast, cache)
     graph.add_node(pydot.Node(node_name, label="START", fillcolor="white"))